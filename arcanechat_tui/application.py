@@ -7,35 +7,61 @@ from typing import Optional, Tuple
 import urwid
 from deltachat2 import Client
 
+from .cache import DEFAULT_BUDGET
 from .cards_widget import CardsWidget
 from .chatlist import CHAT_SELECTED, ChatListWidget
 from .composer import SENDING_MSG_FAILED, ComposerWidget
 from .container import Container
 from .conversation import ConversationWidget
 from .eventcenter import CHATLIST_CHANGED, MESSAGES_CHANGED, EventCenter
+from .hud import PerformanceHud
+from .prefetch import Prefetcher
+from .render import MeasuredMainLoop, RenderScheduler
 from .util import shorten_text
+from .watchdog import (
+    RPC_RESTARTED,
+    RPC_STATUS_CHANGED,
+    STATUS_OK,
+    STATUS_RESTARTING,
+    RpcWatchdog,
+)
 from .welcome_widget import WelcomeWidget
 
 
 class Application:
     """Main application UI"""
 
-    def __init__(self, client: Client, keymap: dict, theme: dict) -> None:
+    def __init__(
+        self,
+        client: Client,
+        keymap: dict,
+        theme: dict,
+        *,
+        max_fps: float = 30,
+        paste_file_size: int = 0,
+        collapse_lines: int = 0,
+        watchdog: Optional[RpcWatchdog] = None,
+    ) -> None:
         self.client = client
         self.keymap = keymap
         self.accid: Optional[int] = None
-        eventcenter = EventCenter()
+        self.eventcenter = eventcenter = EventCenter()
 
         self.chatlist = ChatListWidget(client)
         urwid.connect_signal(eventcenter, CHATLIST_CHANGED, self.chatlist.chatlist_changed)
         chatlist_cont = Container(self.chatlist, self._chatlist_keypress)
 
-        conversation = ConversationWidget(client, theme["background"][-1])
-        urwid.connect_signal(self.chatlist, CHAT_SELECTED, conversation.set_chat)
-        urwid.connect_signal(eventcenter, MESSAGES_CHANGED, conversation.messages_changed)
-        conversation_cont = Container(conversation, self._conversation_keypress)
+        self.prefetcher = Prefetcher(client)
+        urwid.connect_signal(eventcenter, MESSAGES_CHANGED, self.prefetcher.messages_changed)
 
-        composer = ComposerWidget(client, keymap)
+        self.conversation = ConversationWidget(
+            client, theme["background"][-1], self.prefetcher, collapse_lines
+        )
+        urwid.connect_signal(self.chatlist, CHAT_SELECTED, self.conversation.set_chat)
+        urwid.connect_signal(eventcenter, MESSAGES_CHANGED, self.conversation.messages_changed)
+        conversation_cont = Container(self.conversation, self._conversation_keypress)
+
+        self.composer = composer = ComposerWidget(client, keymap, paste_file_size)
         urwid.connect_signal(self.chatlist, CHAT_SELECTED, composer.set_chat)
         composer_cont = Container(composer, self._composer_keypress)
 
@@ -54,12 +80,26 @@ class Application:
         )
         self.frame = urwid.Frame(self.main_columns)
 
-        self.loop = urwid.MainLoop(
+        self.loop = MeasuredMainLoop(
             urwid.AttrMap(self.frame, "background"),
             [(key, *value) for key, value in theme.items()],
+            # bracketed paste lets the composer get pasted text in one go
+            screen=urwid.display.raw.Screen(bracketed_paste_mode=True),
             unhandled_input=self._unhandled_keypress,
         )
         self.loop.screen.set_terminal_properties(colors=256)
+        self.renderer = RenderScheduler(self.loop, max_fps)
+        self.hud = PerformanceHud(client, self.loop, DEFAULT_BUDGET)
+        self.hud_visible = False
+        self._hud_alarm = None
+        client.add_hook(self.hud.count_event)
+        self.rpc_status = urwid.AttrMap(urwid.Text("", wrap="ellipsis"), "failed")
+        self.rpc_status_visible = False
+
+        self.watchdog = watchdog
+        if watchdog:
+            urwid.connect_signal(watchdog, RPC_STATUS_CHANGED, self.rpc_status_changed)
+            urwid.connect_signal(watchdog, RPC_RESTARTED, self.rpc_restarted)
 
         urwid.connect_signal(self.chatlist, CHAT_SELECTED, self.chat_selected)
         urwid.connect_signal(composer, SENDING_MSG_FAILED, self.sending_msg_failed)
@@ -91,6 +131,9 @@ class Application:
             # focus composer
             self.main_columns.focus_position = 2
             self.right_side.focus_position = 1
+            # load in background the chats the user is likely to open next
+            adjacent = self.chatlist.adjacent_chats(chat)
+            self.prefetcher.prefetch(chat[0], adjacent, self.chatlist.top_chats(20))
         else:
             self.cards.show("welcome")
             # focus chatlist
@@ -99,12 +142,38 @@ class Application:
     def messages_changed(self, _client: Client, accid: int, chatid: int, _msgid: int) -> None:
         chat = self.chatlist.selected_chat
         if accid == self.accid and chat and chatid in (chat[1], 0):
-            self.loop.draw_screen()
+            self.renderer.mark_dirty(self.conversation)
 
     def chatlist_changed(self, _client: Client, accid: int) -> None:
         self._print_title()
         if accid == self.accid:
-            self.loop.draw_screen()
+            self.renderer.mark_dirty(self.chatlist)
+
+    def rpc_status_changed(self, _watchdog: RpcWatchdog, status: str, latency: float) -> None:
+        # called from the watchdog's thread, the footer is changed in the main loop thread
+        self.renderer.call_soon(lambda: self._show_rpc_status(status, latency))
+
+    def _show_rpc_status(self, status: str, latency: float) -> None:
+        if status == STATUS_RESTARTING:
+            text = " RPC server not responding, restarting..."
+        else:
+            text = f" RPC server is slow, response time: {latency:.1f}s"
+        self.rpc_status.original_widget.set_text(text)
+        visible = status != STATUS_OK
+        if visible != self.rpc_status_visible:
+            self.rpc_status_visible = visible
+            if visible or self.frame.footer == self.rpc_status:
+                self.frame.footer = self._default_footer()
+
+    def rpc_restarted(self, _watchdog: RpcWatchdog) -> None:
+        """Start the accounts again and reload the chats from the new RPC server."""
+        self.client.rpc.start_io_for_all_accounts()
+        self.renderer.call_soon(self._reload_account)
+
+    def _reload_account(self) -> None:
+        if self.accid:
+            urwid.emit_signal(self.eventcenter, CHATLIST_CHANGED, self.client, self.accid)
+            urwid.emit_signal(self.eventcenter, MESSAGES_CHANGED, self.client, self.accid, 0, 0)
 
     def sending_msg_failed(self, error: str) -> None:
         self.toast(urwid.AttrMap(urwid.Text([" Error: ", error]), "failed"), 5)
@@ -112,14 +181,44 @@ class Application:
     def toast(self, element: urwid.Widget, duration: int) -> None:
         def reset_footer(*_) -> None:
             if self.frame.footer == element:
-                self.frame.footer = None
+                self.frame.footer = self._default_footer()
 
         self.frame.footer = element
         self.loop.set_alarm_in(duration, reset_footer)
 
+    def toggle_hud(self) -> None:
+        """Show or hide the performance metrics overlay."""
+        self.hud_visible = not self.hud_visible
+        if self.hud_visible:
+            self.frame.footer = self.hud
+            self._update_hud()
+        else:
+            if self._hud_alarm:
+                self.loop.remove_alarm(self._hud_alarm)
+                self._hud_alarm = None
+            if self.frame.footer == self.hud:
+                self.frame.footer = self._default_footer()
+
+    def _default_footer(self) -> Optional[urwid.Widget]:
+        if self.rpc_status_visible:
+            return self.rpc_status
+        return self.hud if self.hud_visible else None
+
+    def _update_hud(self, *_) -> None:
+        if self.hud_visible:
+            # the main loop repaints only the changed widgets after an alarm
+            self.hud.update()
+            self._hud_alarm = self.loop.set_alarm_in(1, self._update_hud)
+
     def _unhandled_keypress(self, key: str) -> None:
         if key == self.keymap["quit"]:
             self.exit()
+        elif key == self.keymap["toggle_hud"]:
+            self.toggle_hud()
+        elif key == self.keymap["next_chat"]:
+            self.chatlist.select_next_chat(-1)
+        elif key == self.keymap["prev_chat"]:
+            self.chatlist.select_next_chat(1)
 
     def _chatlist_keypress(self, _size: list, key: str) -> Optional[str]:
         if key in ("right", "tab"):
@@ -130,6 +229,9 @@ class Application:
         return key
 
     def _conversation_keypress(self, _size: list, key: str) -> Optional[str]:
+        if key == self.keymap["toggle_msg"]:
+            self.conversation.toggle_focused_message()
+            return None
         if key in ("tab", "esc"):
             # give focus to the composer area
             self.right_side.focus_position = 1
@@ -159,7 +261,14 @@ class Application:
         self.chatlist.set_account(self.accid)
         self._print_title()
         Thread(target=self.client.run_forever, daemon=True).start()
+        if self.watchdog:
+            self.watchdog.start()
         try:
             self.loop.run()
         except KeyboardInterrupt:
             pass
+        finally:
+            self.composer.discard_attachment()
+            if self.watchdog:
+                self.watchdog.stop()
+            self.renderer.close()
@@ -0,0 +1,146 @@
+"""Widget caches sharing a memory budget"""
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+
+import urwid
+
+WIDGET_OVERHEAD = 400  # rough size in bytes of an urwid widget object without its content
+ATTRIBUTE_OVERHEAD = 64  # rough size in bytes of an entry of a Text widget's attributes list
+
+
+def estimate_widget_size(widget: urwid.Widget) -> int:
+    """Roughly estimate the memory used by the given widget and its children, in bytes.
+
+    Widgets holding data that is not displayed can report its size in an
+    `extra_size` attribute.
+    """
+    size = 0
+    stack = [widget]
+    while stack:
+        wgt = stack.pop()
+        size += WIDGET_OVERHEAD + getattr(wgt, "extra_size", 0)
+        if isinstance(wgt, urwid.Text):
+            text, attrib = wgt.get_text()
+            size += sys.getsizeof(text) + ATTRIBUTE_OVERHEAD * len(attrib)
+        elif isinstance(wgt, urwid.WidgetDecoration):
+            stack.append(wgt.original_widget)
+        elif isinstance(wgt, urwid.WidgetContainerMixin):
+            stack.extend(child for child, _ in getattr(wgt, "contents", []))
+        elif isinstance(wgt, urwid.WidgetWrap):
+            stack.append(getattr(wgt, "_w"))
+    return size
+
+
+class CacheBudget:
+    """Memory budget shared by several caches.
+
+    The least recently used entry among all the caches sharing the budget is
+    evicted first when the budget is exceeded.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.caches: List["WidgetCache"] = []
+        self.lock = threading.RLock()
+        self._lru: "OrderedDict[Tuple[WidgetCache, Hashable], int]" = OrderedDict()
+
+    def stats(self) -> dict:
+        """Return the statistics of the budget and of each cache using it."""
+        with self.lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "used_bytes": self.used_bytes,
+                "caches": [cache.stats() for cache in self.caches],
+            }
+
+    def _touch(self, cache: "WidgetCache", key: Hashable) -> None:
+        self._lru.move_to_end((cache, key))
+
+    def _add(self, cache: "WidgetCache", key: Hashable, size: int) -> None:
+        self._lru[(cache, key)] = size
+        self.used_bytes += size
+        while self.used_bytes > self.max_bytes and len(self._lru) > 1:
+            (victim, victim_key), _ = next(iter(self._lru.items()))
+            victim._remove(victim_key)  # pylint: disable=protected-access
+            victim.evictions += 1
+
+    def _remove(self, cache: "WidgetCache", key: Hashable) -> None:
+        self.used_bytes -= self._lru.pop((cache, key))
+
+
+DEFAULT_BUDGET = CacheBudget(64 * 1024 * 1024)
+
+
+class WidgetCache:
+    """Cache of widgets with a size estimate for each entry"""
+
+    def __init__(self, name: str, budget: CacheBudget = DEFAULT_BUDGET) -> None:
+        self.name = name
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._entries: dict = {}
+        with budget.lock:
+            budget.caches.append(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[urwid.Widget]:
+        """Get the widget cached for the given key or None if it is not in the cache."""
+        with self.budget.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.budget._touch(self, key)  # pylint: disable=protected-access
+            return entry[0]
+
+    def put(self, key: Hashable, widget: urwid.Widget, size: int = 0) -> None:
+        """Add a widget to the cache, if size is not given it is estimated."""
+        size = size or estimate_widget_size(widget)
+        with self.budget.lock:
+            self.invalidate(key)
+            self._entries[key] = (widget, size)
+            self.size += size
+            self.budget._add(self, key, size)  # pylint: disable=protected-access
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Remove the given key from the cache, return True if it was cached."""
+        with self.budget.lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def clear(self) -> None:
+        """Remove all the entries from the cache."""
+        with self.budget.lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def stats(self) -> dict:
+        """Return the cache statistics."""
+        requests = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / requests if requests else 0.0,
+        }
+
+    def _remove(self, key: Hashable) -> Any:
+        widget, size = self._entries.pop(key)
+        self.size -= size
+        self.budget._remove(self, key)  # pylint: disable=protected-access
+        return widget
@@ -1,31 +1,31 @@
 """Chat list widget"""
 
-from typing import Any, Callable, Optional, Tuple
+from typing import Any, List, NamedTuple, Optional, Tuple
 
 import urwid
 from deltachat2 import ChatlistFlag, Client
 
 from .lazylistwaker import LazyListWalker
-from .util import shorten_text
+from .util import get_style, shorten_text
 
 CHAT_SELECTED = "chat_selected"
 
 
-class ChatListItem(urwid.Button):
-    """A single chatlist item"""
+class ChatSummary(NamedTuple):
+    """The chat data needed to display a chatlist item"""
 
-    def __init__(
-        self,
-        accid: int,
-        item: Any,
-        selected: bool,
-        callback: Callable[["ChatListItem"], None],
-    ) -> None:
-        super().__init__("", callback)
-        self.accid = accid
-        self.id = item.id
-        elements: list = []
+    accid: int
+    id: int
+    name: str
+    icon: str
+    color: str
+    is_pinned: bool
+    is_muted: bool
+    fresh_msgs: int
 
+    @classmethod
+    def from_item(cls, accid: int, item: Any) -> "ChatSummary":
+        """Create a summary from a chatlist item as returned by the RPC."""
         if item.is_self_talk:
             color = "#0af"
             icon = "*"
@@ -35,22 +35,50 @@ class ChatListItem(urwid.Button):
         else:
             color = item.color
             icon = "@" if item.dm_chat_contact else "#"
-        elements.append((urwid.AttrSpec("#fff", color), f" {icon} "))
-
-        if item.is_pinned:
-            elements.append("*")
-        else:
-            elements.append(" ")
-
-        name = shorten_text(item.name, 40)
-        elements.append(("selected_chat", name) if selected else name)
-
-        if item.fresh_message_counter > 0:
-            elements.append(" ")
-            style = "unread_badge_muted" if item.is_muted else "unread_badge"
-            elements.append((style, f"({item.fresh_message_counter})"))
-
-        self._w = urwid.AttrMap(urwid.SelectableIcon(elements, 3), None, focus_map="focused_item")
+        return cls(
+            accid,
+            item.id,
+            shorten_text(item.name, 40),
+            icon,
+            color,
+            item.is_pinned,
+            item.is_muted,
+            item.fresh_message_counter,
+        )
+
+
+class ChatListItem(urwid.Text):
+    """A single chatlist item.
+
+    This is a plain selectable text, clicks are handled by ChatListWidget.
+    """
+
+    _selectable = True
+
+    def __init__(self, chat: ChatSummary, selected: bool) -> None:
+        self.chat = chat
+        elements: list = [(get_style("#fff", chat.color), f" {chat.icon} ")]
+        elements.append("*" if chat.is_pinned else " ")
+        elements.append(("selected_chat", chat.name) if selected else chat.name)
+        if chat.fresh_msgs > 0:
+            style = "unread_badge_muted" if chat.is_muted else "unread_badge"
+            elements.extend([" ", (style, f"({chat.fresh_msgs})")])
+        super().__init__(elements, wrap="clip")
+
+    def keypress(self, _size: tuple, key: str) -> str:
+        return key
+
+    def mouse_event(self, size: tuple, event: str, button: int, *args) -> bool:
+        del size, args  # unused
+        return button == 1 and urwid.util.is_mouse_press(event)
+
+    # a composite canvas is returned when focused, not the TextCanvas of urwid.Text
+    def render(self, size: tuple, focus: bool = False) -> urwid.Canvas:  # type: ignore[override]
+        canvas: urwid.Canvas = super().render(size)
+        if focus:
+            canvas = urwid.CompositeCanvas(canvas)
+            canvas.fill_attr_apply({None: "focused_item"})
+        return canvas
 
 
 class ChatListWidget(urwid.ListBox):
@@ -62,7 +90,7 @@ class ChatListWidget(urwid.ListBox):
         self.client = client
         self.accid: Optional[int] = None
         self.selected_chat: Optional[Tuple[int, int]] = None
-        super().__init__(LazyListWalker([], self._create_chatlist_item))
+        super().__init__(LazyListWalker([], self._create_chatlist_item, "chatlist"))
 
     def set_account(self, accid: Optional[int]) -> None:
         self.accid = accid
@@ -71,8 +99,43 @@ class ChatListWidget(urwid.ListBox):
         self.chatlist_changed(self.client, accid)
 
     def select_chat(self, chat: Optional[Tuple[int, int]]) -> None:
+        old_chat = self.selected_chat
         self._select_chat(chat)
-        self.chatlist_changed(self.client, self.accid)
+        # only the previously and newly selected items need to be updated
+        for item in (old_chat, chat):
+            if item:
+                self.body.invalidate(item)
+        self._invalidate()
+
+    def select_next_chat(self, step: int) -> None:
+        """Select the chat `step` positions below the selected chat, or above if negative."""
+        if not self.body:
+            return
+        try:
+            index = self.body.index(self.selected_chat) + step
+        except ValueError:
+            index = 0
+        index = min(max(index, 0), len(self.body) - 1)
+        # keep the focus on the selected chat so it stays visible
+        self.set_focus(index)
+        self.select_chat(self.body.get_item(index))
+
+    def adjacent_chats(self, chat: Tuple[int, int], distance: int = 1) -> List[int]:
+        """Get the IDs of the chats around the given chat, nearest first."""
+        try:
+            index = self.body.index(chat)
+        except ValueError:
+            return []
+        chatids = []
+        for offset in range(1, distance + 1):
+            for pos in (index - offset, index + offset):
+                if 0 <= pos < len(self.body):
+                    chatids.append(self.body.get_item(pos)[1])
+        return chatids
+
+    def top_chats(self, count: int) -> List[int]:
+        """Get the IDs of the first chats in the list."""
+        return [self.body.get_item(pos)[1] for pos in range(min(count, len(self.body)))]
 
     def chatlist_changed(self, client: Client, accid: Optional[int]) -> None:
         if not self.accid:
@@ -80,24 +143,32 @@ class ChatListWidget(urwid.ListBox):
             self.body.clear()
         elif accid == self.accid:
             entries = client.rpc.get_chatlist_entries(accid, ChatlistFlag.NO_SPECIALS, None, None)
-            item = self.focus
+            item = self.body.get_item(self.focus_position) if self.body else None
             self.body.clear_cache()
             self.body[:] = [(accid, chatid) for chatid in entries]
             try:
-                index = max(entries.index(item.id), 0) if item else 0
+                index = max(entries.index(item[1]), 0) if item else 0
             except ValueError:
                 pass
             else:
                 if entries:
                     self.set_focus(index)
 
+    def keypress(self, size: tuple, key: str) -> Optional[str]:
+        if key in ("enter", " ") and self.body:
+            self.select_chat(self.body.get_item(self.focus_position))
+            return None
+        return super().keypress(size, key)
+
+    def mouse_event(self, size: tuple, event: str, button: int, *args) -> bool:
+        handled = super().mouse_event(size, event, button, *args)
+        if handled and button == 1 and urwid.util.is_mouse_press(event):
+            self.select_chat(self.body.get_item(self.focus_position))
+        return bool(handled)
+
     def _create_chatlist_item(self, chat: Tuple[int, int]) -> urwid.Widget:
         item = self.client.rpc.get_chatlist_items_by_entries(chat[0], [chat[1]])[str(chat[1])]
-        return ChatListItem(chat[0], item, self.selected_chat == chat, self._on_item_clicked)
-
-    def _on_item_clicked(self, item: ChatListItem) -> None:
-        self._select_chat((item.accid, item.id))
-        self.chatlist_changed(self.client, self.accid)  # so the selected chat widget is updated
+        return ChatListItem(ChatSummary.from_item(chat[0], item), self.selected_chat == chat)
 
     def _select_chat(self, chat: Optional[Tuple[int, int]]) -> None:
         self.selected_chat = chat
@@ -1,15 +1,41 @@
 """Command line arguments parsing"""
 
+import json
+import os
 import sys
 from argparse import ArgumentParser, Namespace
-from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from typing import Callable, Dict, List, Optional, Tuple
 
 from appdirs import user_config_dir
-from deltachat2 import Client, JsonRpcError
+from deltachat2 import Client, JsonRpcError, Rpc
 
 from . import APP_NAME
 from ._version import __version__
-from .util import abspath, get_account, get_or_create_account, parse_docstring
+from .export import ExportWriter, export_messages, iter_chat_ids
+from .util import (
+    abspath,
+    get_account,
+    get_address,
+    get_or_create_account,
+    parse_docstring,
+)
+from .watch import EventStreamer
+
+MAX_WORKERS = 8
+# configuration values managed by the core, they are dumped but never applied
+INTERNAL_CONFIG_PREFIXES = ("sys.", "configured_")
+INTERNAL_CONFIG_KEYS = {
+    "addr",
+    "configured",
+    "key_id",
+    "fetched_existing_msgs",
+    "last_housekeeping",
+    "last_cant_decrypt_outgoing_msgs",
+    "last_msg_id",
+    "quota_exceeding",
+}
 
 
 class Cli:
@@ -48,6 +74,81 @@ class Cli:
             type=str.lower,
         )
 
+        self._parser.add_argument(
+            "--log-format",
+            help="format of the log file (default: %(default)s)",
+            choices=["text", "json"],
+            default="text",
+            type=str.lower,
+        )
+
+        self._parser.add_argument(
+            "--log-rate",
+            help=(
+                "maximum number of log entries per second for each type of message, extra"
+                " entries are dropped and counted, warnings and errors are never dropped,"
+                " 0 means no limit (default: %(default)s)"
+            ),
+            metavar="N",
+            default=50,
+            type=int,
+        )
+
+        self._parser.add_argument(
+            "--max-fps",
+            help=(
+                "maximum number of times per second the screen is repainted on incoming"
+                " events, 0 means no limit (default: %(default)s)"
+            ),
+            metavar="N",
+            default=30,
+            type=float,
+        )
+
+        self._parser.add_argument(
+            "--paste-file-size",
+            help=(
+                "attach pasted text as a file instead of inserting it in the composer"
+                " if it is this size in bytes or bigger, 0 to disable (default: %(default)s)"
+            ),
+            metavar="BYTES",
+            default=0,
+            type=int,
+        )
+
+        self._parser.add_argument(
+            "--collapse-lines",
+            help=(
+                "display only the first lines of messages longer than this number of lines,"
+                " 0 to always display the full text (default: %(default)s)"
+            ),
+            metavar="N",
+            default=30,
+            type=int,
+        )
+
+        self._parser.add_argument(
+            "--rpc-slow",
+            help=(
+                "show a warning in the status bar if the RPC server takes more than this"
+                " number of seconds to respond (default: %(default)s)"
+            ),
+            metavar="SECONDS",
+            default=2,
+            type=float,
+        )
+
+        self._parser.add_argument(
+            "--rpc-timeout",
+            help=(
+                "restart the RPC server if it doesn't respond in this number of seconds,"
+                " 0 to never restart it (default: %(default)s)"
+            ),
+            metavar="SECONDS",
+            default=30,
+            type=float,
+        )
+
         init_parser = self.add_subcommand(init_cmd, name="init")
         init_parser.add_argument("addr", help="your e-mail address")
         init_parser.add_argument("password", help="your password")
@@ -58,6 +159,93 @@ class Cli:
         config_parser = self.add_subcommand(config_cmd, name="config")
         config_parser.add_argument("option", help="option name", nargs="?")
         config_parser.add_argument("value", help="option value to set", nargs="?")
+        config_parser.add_argument(
+            "--all-accounts",
+            "-A",
+            help="get or set the configuration of all accounts",
+            action="store_true",
+        )
+        config_group = config_parser.add_mutually_exclusive_group()
+        config_group.add_argument(
+            "--dump",
+            help="save the configuration to the given JSON file, use - for standard output",
+            metavar="PATH",
+        )
+        config_group.add_argument(
+            "--apply",
+            help="set the configuration values from a JSON file created with --dump",
+            metavar="PATH",
+        )
+
+        export_parser = self.add_subcommand(export_cmd, name="export")
+        export_parser.add_argument(
+            "--chat",
+            "-c",
+            help="ID of the chat to export, can be used multiple times (default: all chats)",
+            metavar="ID",
+            action="append",
+            type=int,
+        )
+        export_parser.add_argument(
+            "--format",
+            help="output format (default: %(default)s)",
+            choices=["jsonl", "csv"],
+            default="jsonl",
+            type=str.lower,
+        )
+        export_parser.add_argument(
+            "--output",
+            "-o",
+            help="file to write the messages to (default: standard output)",
+            metavar="PATH",
+            type=abspath,
+        )
+        export_parser.add_argument(
+            "--after",
+            help="only export messages with ID greater than the given one, to resume an export",
+            metavar="MSGID",
+            default=0,
+            type=int,
+        )
+        export_parser.add_argument(
+            "--batch-size",
+            help="number of messages to fetch per request (default: %(default)s)",
+            metavar="N",
+            default=200,
+            type=int,
+        )
+
+        watch_parser = self.add_subcommand(watch_cmd, name="watch")
+        watch_parser.add_argument(
+            "--events",
+            "-e",
+            help="comma-separated list of event types to stream (default: all events)",
+            metavar="TYPES",
+            type=lambda arg: set(arg.split(",")),
+        )
+        watch_parser.add_argument(
+            "--messages",
+            "-m",
+            help="include the related message in the output of message events",
+            action="store_true",
+        )
+        watch_parser.add_argument(
+            "--batch-size",
+            help="maximum number of events written at once (default: %(default)s)",
+            metavar="N",
+            default=500,
+            type=int,
+        )
+        watch_parser.add_argument(
+            "--queue-size",
+            help=(
+                "maximum number of events waiting to be written, when full event processing"
+                " waits for the output to be consumed (default: %(default)s)"
+            ),
+            metavar="N",
+            default=5000,
+            type=int,
+        )
 
     def add_subcommand(
         self,
@@ -111,39 +299,196 @@ def import_cmd(client: Client, args: Namespace) -> None:
 
 
 def config_cmd(client: Client, args: Namespace) -> None:
-    """set or get account configuration values"""
-    accounts = client.rpc.get_all_account_ids()
-    if not args.account and len(accounts) == 1:
-        args.account = accounts[0]
+    """set or get account configuration values.
 
-    if args.account:
-        accid = get_account(client.rpc, args.account)
-        if not accid or accid not in accounts:
-            print(f"Error: unknown account: {args.account!r}")
-            sys.exit(1)
+    With --all-accounts the values are set or get for all the accounts at once, and
+    with --dump and --apply the configuration can be saved to or loaded from a JSON file.
+    """
+    rpc = client.rpc
+    accids = _get_config_accounts(rpc, args)
+    keys = (rpc.get_config(accids[0], "sys.config_keys") or "").split()
+    if args.option and not args.option.startswith("ui.") and args.option not in keys:
+        print(f"Error: unknown configuration option: {args.option}")
+        sys.exit(1)
 
-        keys = (client.rpc.get_config(accid, "sys.config_keys") or "").split()
-        if args.option and not args.option.startswith("ui.") and args.option not in keys:
-            print(f"Error: unknown configuration option: {args.option}")
-            sys.exit(1)
+    if args.apply:
+        apply_config(rpc, accids, args.apply)
+        if not args.option:
+            return
+    if args.value:
+        set_config(rpc, accids, {args.option: args.value})
 
-        if args.value:
-            client.rpc.set_config(accid, args.option, args.value)
-
-        if args.option:
-            try:
-                value = client.rpc.get_config(accid, args.option)
-                print(f"{args.option}={value!r}")
-            except JsonRpcError:
-                print(f"Error: unknown configuration option: {args.option}")
-                sys.exit(1)
-        else:
-            for key in keys:
-                value = client.rpc.get_config(accid, key)
-                print(f"{key}={value!r}")
+    try:
+        configs = get_config(rpc, accids, [args.option] if args.option else keys)
+    except JsonRpcError:
+        print(f"Error: unknown configuration option: {args.option}")
+        sys.exit(1)
+
+    if args.dump:
+        _dump_config(configs, args.dump)
     else:
+        _print_config(configs, args.all_accounts)
+
+
+def _dump_config(configs: Dict[str, dict], path: str) -> None:
+    text = json.dumps(configs, indent=2, sort_keys=True)
+    if path == "-":
+        print(text)
+        return
+    # the configuration includes passwords, only the user can read the file
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.fchmod(fd, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        file.write(text + "\n")
+
+
+def _print_config(configs: Dict[str, dict], show_addr: bool) -> None:
+    for addr, config in configs.items():
+        if show_addr:
+            print(f"[{addr}]")
+        for key, value in config.items():
+            print(f"{key}={value!r}")
+
+
+def _get_config_accounts(rpc: Rpc, args: Namespace) -> List[int]:
+    accounts = rpc.get_all_account_ids()
+    if args.all_accounts:
+        if args.account:
+            print("Error: --account and --all-accounts can't be used together")
+            sys.exit(1)
+        if not accounts:
+            print("Error: there are no accounts")
+            sys.exit(1)
+        return accounts
+
+    if not args.account and len(accounts) == 1:
+        args.account = accounts[0]
+    if not args.account:
         print(
             "Error: you must use --account option to set what account to set/get"
             " configuration values"
         )
         sys.exit(1)
+    accid = get_account(rpc, args.account)
+    if not accid or accid not in accounts:
+        print(f"Error: unknown account: {args.account!r}")
+        sys.exit(1)
+    return [accid]
+
+
+def get_config(rpc: Rpc, accids: List[int], keys: List[str]) -> Dict[str, dict]:
+    """Get the given configuration values of the given accounts, indexed by account address,
+    or by "account-<ID>" for the accounts without address.
+
+    The values of each account are requested in a single call, and the accounts are
+    processed concurrently.
+    """
+
+    def _get_config(accid: int) -> Tuple[str, dict]:
+        values = rpc.batch_get_config(accid, keys)
+        return _config_key(rpc, accid), {key: values.get(key) for key in keys}
+
+    with ThreadPoolExecutor(max_workers=min(len(accids), MAX_WORKERS)) as executor:
+        return dict(executor.map(_get_config, accids))
+
+
+def set_config(rpc: Rpc, accids: List[int], values: Dict[str, str]) -> None:
+    """Set the given configuration values in the given accounts, concurrently."""
+    with ThreadPoolExecutor(max_workers=min(len(accids), MAX_WORKERS)) as executor:
+        list(executor.map(lambda accid: rpc.batch_set_config(accid, values), accids))
+
+
+def _config_key(rpc: Rpc, accid: int) -> str:
+    """Get the key of the account in the configuration dumps."""
+    return get_address(rpc, accid) or f"account-{accid}"
+
+
+def apply_config(rpc: Rpc, accids: List[int], path: str) -> None:
+    """Set the configuration values from the given JSON file, as created by `config --dump`.
+
+    Only the values that differ from the current ones are set, the values managed
+    by the core are skipped, and the accounts are processed concurrently.
+    """
+    with open(path, encoding="utf-8") as file:
+        configs: Dict[str, dict] = json.load(file)
+
+    def _apply_config(accid: int) -> Optional[str]:
+        addr = _config_key(rpc, accid)
+        config = configs.get(addr)
+        if config is None:
+            return None
+        config = {
+            key: val
+            for key, val in config.items()
+            if key not in INTERNAL_CONFIG_KEYS and not key.startswith(INTERNAL_CONFIG_PREFIXES)
+        }
+        current = rpc.batch_get_config(accid, list(config))
+        changes = {key: val for key, val in config.items() if current.get(key) != val}
+        if changes:
+            rpc.batch_set_config(accid, changes)
+        return addr
+
+    with ThreadPoolExecutor(max_workers=min(len(accids), MAX_WORKERS)) as executor:
+        applied = set(executor.map(_apply_config, accids))
+    for addr in configs:
+        if addr not in applied:
+            print(f"Warning: no matching account for {addr!r}, configuration not applied")
+
+
+def export_cmd(client: Client, args: Namespace) -> None:
+    """export chat messages as JSONL or CSV.
+
+    Messages are streamed in batches so memory usage stays flat even for big accounts,
+    progress is reported to the standard error output.
+    """
+    accounts = client.rpc.get_all_account_ids()
+    if not args.account and len(accounts) == 1:
+        args.account = accounts[0]
+
+    if not args.account:
+        print("Error: you must use --account option to set what account to export", file=sys.stderr)
+        sys.exit(1)
+
+    accid = get_account(client.rpc, args.account)
+    if not accid or accid not in accounts:
+        print(f"Error: unknown account: {args.account!r}", file=sys.stderr)
+        sys.exit(1)
+
+    chatids = args.chat or iter_chat_ids(client.rpc, accid)
+    kwargs = {"batch_size": args.batch_size, "after": args.after}
+    if args.output:
+        with open(args.output, "a" if args.after else "w", encoding="utf-8", newline="") as file:
+            writer = ExportWriter(file, args.format, header=file.tell() == 0)
+            export_messages(client.rpc, accid, chatids, writer, **kwargs)
+    else:
+        writer = ExportWriter(sys.stdout, args.format)
+        export_messages(client.rpc, accid, chatids, writer, **kwargs)
+
+
+def watch_cmd(client: Client, args: Namespace) -> None:
+    """stream core events as JSONL to the standard output.
+
+    Runs without user interface until interrupted, useful for scripting and monitoring.
+    """
+    accid = 0
+    if args.account:
+        accid = get_account(client.rpc, args.account)
+        if not accid or accid not in client.rpc.get_all_account_ids():
+            print(f"Error: unknown account: {args.account!r}", file=sys.stderr)
+            sys.exit(1)
+
+    streamer = EventStreamer(
+        client,
+        sys.stdout,
+        kinds=args.events,
+        accid=accid,
+        fetch_messages=args.messages,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+    )
+    client.add_hook(streamer.on_event)
+    Thread(target=client.run_forever, args=(accid,), daemon=True).start()
+    try:
+        streamer.run()
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
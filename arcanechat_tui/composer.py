@@ -1,6 +1,8 @@
 """Composer area widget"""
 
-from typing import Dict, Optional, Tuple
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
 
 import urwid
 import urwid_readline
@@ -31,10 +33,17 @@ class ComposerWidget(urwid.Filler):
 
     signals = [SENDING_MSG_FAILED]
 
-    def __init__(self, client: Client, keymap: Dict[str, str]) -> None:
+    def __init__(self, client: Client, keymap: Dict[str, str], paste_file_size: int = 0) -> None:
+        """
+        :param paste_file_size: pasted text with this size in bytes or bigger is attached
+                                as a file instead of inserted in the composer, 0 to disable
+        """
         self.client = client
         self.keymap = keymap
+        self.paste_file_size = paste_file_size
         self.chat: Optional[Tuple[int, int]] = None
+        self.attachment: Optional[str] = None
+        self._paste: Optional[List[str]] = None
         self.status_bar = urwid.Text(("status_bar", ""), align="left")
         self.edit_widget = ReadlineEdit2(keymap["insert_new_line"])
         prompt = urwid.Columns([(urwid.PACK, urwid.Text("> ")), self.edit_widget])
@@ -45,8 +54,31 @@ class ComposerWidget(urwid.Filler):
         self.chat = chat
         self.edit_widget.set_edit_text("")
         self.edit_widget.set_edit_pos(0)
+        self._set_attachment(None)
         self._update_status_bar(chat)
 
+    def discard_attachment(self) -> None:
+        """Drop the pasted text attached to the next message, if any."""
+        if self.attachment:
+            self._set_attachment(None)
+            self._update_status_bar(self.chat)
+
+    def _set_attachment(self, path: Optional[str]) -> None:
+        if self.attachment:
+            os.remove(self.attachment)
+        self.attachment = path
+
+    def _paste_text(self, text: str) -> None:
+        """Insert the pasted text in one go, or attach it as a file if it is too big."""
+        if self.paste_file_size and len(text.encode()) >= self.paste_file_size:
+            fd, path = tempfile.mkstemp(prefix="paste-", suffix=".txt")
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(text)
+            self._set_attachment(path)
+            self._update_status_bar(self.chat)
+        else:
+            self.edit_widget.insert_text(text)
+
     def _send_message(self, text) -> None:
         accid, chatid = self.chat or (0, 0)
         if accid:
@@ -55,7 +87,9 @@ class ComposerWidget(urwid.Filler):
                 # accept contact requests automatically on sending
                 self.client.rpc.accept_chat(accid, chatid)
             try:
-                self.client.rpc.send_msg(accid, chatid, MsgData(text=text))
+                self.client.rpc.send_msg(accid, chatid, MsgData(text=text, file=self.attachment))
+                self._set_attachment(None)
+                self._update_status_bar(self.chat)
             except JsonRpcError:
                 errmsg = "Message could not be sent, are you a member of the chat?"
                 urwid.emit_signal(self, SENDING_MSG_FAILED, errmsg)
@@ -71,15 +105,36 @@ class ComposerWidget(urwid.Filler):
 
             subtitle = shorten_text(get_subtitle(self.client.rpc, chat[0], info), 40)
             text = f" {verified}[ {name} ]{muted} -- {subtitle}"
+            if self.attachment:
+                size = os.path.getsize(self.attachment) // 1024
+                text += f" -- [pasted text attached, {size} KB]"
         else:
             text = f" ArcaneChat {__version__}"
 
         self.status_bar.set_text(text)
 
     def keypress(self, size: list, key: str) -> Optional[str]:
+        if key == "begin paste":
+            self._paste = []
+            return None
+        if self._paste is not None:
+            # buffer bracketed paste input and insert it all at once
+            if key == "end paste":
+                text, self._paste = "".join(self._paste), None
+                self._paste_text(text)
+            elif key == "enter":
+                self._paste.append("\n")
+            elif key == "tab":
+                self._paste.append("\t")
+            elif len(key) == 1:
+                self._paste.append(key)
+            return None
+        if key == "esc" and self.attachment:
+            self.discard_attachment()
+            return None
         if key == self.keymap["send_msg"]:
             text = self.edit_widget.get_edit_text().strip()
-            if text:
+            if text or self.attachment:
                 self.edit_widget.set_edit_text("")
                 self._send_message(text)
             return None
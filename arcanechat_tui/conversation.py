@@ -1,7 +1,8 @@
 """Conversation area widget"""
 
+import sys
 from datetime import datetime
-from typing import Any, Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 import urwid
 from deltachat2 import (
@@ -13,7 +14,10 @@ from deltachat2 import (
 )
 
 from .lazylistwaker import LazyListWalker
-from .util import shorten_text
+from .prefetch import Prefetcher
+from .util import get_style, shorten_text
+
+COLLAPSE_LINE_WIDTH = 120
 
 
 class DayMarker(urwid.Columns):
@@ -29,10 +33,60 @@ class DayMarker(urwid.Columns):
         super().__init__([margin, date_wgt, margin])
 
 
+class MessageBody(urwid.Text):
+    """Message text that is displayed collapsed if it is too long.
+
+    The full text is only laid out when the message is expanded.
+    """
+
+    def __init__(self, prefix: list, text: str, style: Optional[str], max_lines: int) -> None:
+        self._prefix_markup = prefix
+        self._full_text = text
+        self._text_style = style
+        self._rows_cache: Dict[int, int] = {}
+        self.expanded = False
+        self.collapsed_text = collapse_text(text, max_lines) if max_lines else None
+        super().__init__(self._get_markup())
+
+    @property
+    def extra_size(self) -> int:
+        """Memory used by the full text when it is not displayed"""
+        return 0 if self.expanded or self.collapsed_text is None else sys.getsizeof(self._full_text)
+
+    def toggle_expanded(self) -> None:
+        """Switch between the collapsed and full text, if the text is collapsible."""
+        if self.collapsed_text is not None:
+            self.expanded = not self.expanded
+            self.set_text(self._get_markup())
+
+    def rows(self, size: Tuple[int], focus: bool = False) -> int:
+        if self.expanded or self.collapsed_text is None:
+            return super().rows(size, focus)
+        rows = self._rows_cache.get(size[0])
+        if rows is None:
+            rows = self._rows_cache[size[0]] = super().rows(size, focus)
+        return rows
+
+    def _get_markup(self) -> list:
+        if self.expanded or self.collapsed_text is None:
+            text = self._full_text
+        else:
+            text = self.collapsed_text
+        markup = [*self._prefix_markup, (self._text_style, text) if self._text_style else text]
+        if not self.expanded and self.collapsed_text is not None:
+            hidden = len(self._full_text) - len(self.collapsed_text)
+            markup.append(("quote", f"\n[… {hidden} more characters]"))
+        return markup
+
+
 class MessageItem(urwid.AttrMap):
     """A single message item"""
 
-    def __init__(self, msg: Any, nickbg: str) -> None:
+    def __init__(self, msg: Any, nickbg: str, max_lines: int = 0) -> None:
+        """
+        :param max_lines: if the message text has more lines it is displayed collapsed,
+                          0 to always display the full text
+        """
         sender = msg.sender
         sent_date = datetime.fromtimestamp(msg.timestamp)
         if (
@@ -52,7 +106,7 @@ class MessageItem(urwid.AttrMap):
         if msg.quote:
             if msg.quote.kind == "WithMessage":
                 quote_sender = msg.quote.override_sender_name or msg.quote.author_display_name
-                quote_color = urwid.AttrSpec(msg.quote.author_display_color, nickbg)
+                quote_color = get_style(msg.quote.author_display_color, nickbg)
                 lines.append((quote_color, f"│ {quote_sender}\n"))
             else:
                 quote_color = "quote"
@@ -62,41 +116,71 @@ class MessageItem(urwid.AttrMap):
         if msg.file_name:
             text = f"[{msg.file_name}]{' – ' if text else ''}{text}"
         if msg.is_info:
-            lines.append(("system_msg", text))
+            style: Optional[str] = "system_msg"
+        elif sender.id == SpecialContactId.SELF:
+            style = "self_msg"
         else:
-            if sender.id == SpecialContactId.SELF:
-                lines.append(("self_msg", text))
-            else:
-                lines.append(text)
-        body_wgt = urwid.Text(lines or "")
+            style = None
+        self.body = MessageBody(lines, text, style, max_lines)
 
-        cols = urwid.Columns([date_wgt, urwid.Pile([header_wgt, body_wgt])])
+        cols = urwid.Columns([date_wgt, urwid.Pile([header_wgt, self.body])])
         super().__init__(cols, None, focus_map="focused_item")
 
 
 class ConversationWidget(urwid.ListBox):
     """Display a list of messages"""
 
-    def __init__(self, client: Client, nickbg: str) -> None:
+    def __init__(
+        self,
+        client: Client,
+        nickbg: str,
+        prefetcher: Optional[Prefetcher] = None,
+        collapse_lines: int = 0,
+    ) -> None:
         self.client = client
         self.nickbg = nickbg
+        self.prefetcher = prefetcher
+        self.collapse_lines = collapse_lines
         self.chat: Optional[Tuple[int, int]] = None
-        super().__init__(LazyListWalker([], self._create_message_item))
+        self._messages: Dict[int, Any] = {}
+        super().__init__(LazyListWalker([], self._create_message_item, "conversation"))
 
     def set_chat(self, chat: Optional[Tuple[int, int]]) -> None:
         self.chat = chat
+        prefetched = self.prefetcher.pop(chat) if self.prefetcher and chat else None
         if chat:
             self.client.rpc.marknoticed_chat(*chat)
-        self._update_conversation()
-
-    def messages_changed(self, _client: Client, accid: int, chatid: int, _msgid: int) -> None:
-        if self.chat and accid == self.chat[0] and chatid in (self.chat[1], 0):
+        if prefetched:
+            items, self._messages = prefetched
+            self._update_conversation(items=items)
+        else:
+            self._messages = {}
             self._update_conversation()
 
-    def _update_conversation(self) -> None:
-        self.body.clear_cache()
+    def messages_changed(self, _client: Client, accid: int, chatid: int, msgid: int) -> None:
+        if self.chat and accid == self.chat[0] and chatid in (self.chat[1], 0):
+            if msgid:
+                # only the changed message needs to be created again
+                self.body.invalidate((accid, "message", msgid))
+                self._messages.pop(msgid, None)
+            else:
+                self._messages.clear()
+            self._update_conversation(clear_cache=not msgid)
+
+    def toggle_focused_message(self) -> None:
+        """Expand or collapse the focused message."""
+        if not self.body or not isinstance(self.focus, MessageItem):
+            return
+        self.focus.body.toggle_expanded()
+        # update the size estimate of the cached widget
+        self.body.cache.put(self.body.get_item(self.focus_position), self.focus)
+
+    def _update_conversation(self, clear_cache: bool = True, items: Optional[list] = None) -> None:
+        if clear_cache:
+            self.body.clear_cache()
         if self.chat:
-            items = self.client.rpc.get_message_list_items(*self.chat, False, True)
+            if items is None:
+                items = self.client.rpc.get_message_list_items(*self.chat, False, True)
             self.body[:] = [
                 (self.chat[0], item.kind, item.msg_id if item.kind == "message" else item.timestamp)
                 for item in items
@@ -109,13 +193,26 @@ class ConversationWidget(urwid.ListBox):
     def _create_message_item(self, item: Tuple[int, str, int]) -> urwid.Widget:
         if item[1] == "message":
             self.client.rpc.markseen_msgs(item[0], [item[2]])
-            return MessageItem(self.client.rpc.get_message(item[0], item[2]), self.nickbg)
+            msg = self._messages.pop(item[2], None) or self.client.rpc.get_message(item[0], item[2])
+            return MessageItem(msg, self.nickbg, self.collapse_lines)
         return DayMarker(item[2])
 
 
+def collapse_text(
+    text: str, max_lines: int, line_width: int = COLLAPSE_LINE_WIDTH
+) -> Optional[str]:
+    """Get the beginning of the text if it is longer than max_lines, or None otherwise.
+
+    Lines longer than line_width count as several lines.
+    """
+    if len(text) <= max_lines * line_width and text.count("\n") < max_lines:
+        return None
+    return "\n".join(text[: max_lines * line_width].split("\n")[:max_lines])
+
+
 def get_sender_label(msg: Message, nickbg: str) -> urwid.Text:
     name = shorten_text(msg.override_sender_name or msg.sender.display_name, 50)
-    components: list = [(urwid.AttrSpec(msg.sender.color, nickbg), name)]
+    components: list = [(get_style(msg.sender.color, nickbg), name)]
     if msg.state == MessageState.OUT_MDN_RCVD:
         components.append(" ✓✓")
     elif msg.state == MessageState.OUT_DELIVERED:
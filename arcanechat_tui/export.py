@@ -0,0 +1,149 @@
+"""Streaming export of chat history"""
+
+import csv
+import heapq
+import json
+import sys
+import time
+from array import array
+from typing import Any, Iterable, Iterator, List, Optional, TextIO
+
+from deltachat2 import ChatlistFlag, Rpc
+
+EXPORT_FIELDS = [
+    "id",
+    "chat_id",
+    "timestamp",
+    "sender_id",
+    "sender_addr",
+    "sender_name",
+    "text",
+    "file_name",
+    "is_info",
+    "state",
+]
+
+
+def iter_chat_ids(rpc: Rpc, accid: int) -> Iterator[int]:
+    """Iterate over the IDs of all the chats of the given account."""
+    yield from rpc.get_chatlist_entries(accid, ChatlistFlag.NO_SPECIALS, None, None)
+
+
+def iter_msg_id_batches(
+    rpc: Rpc, accid: int, chatids: Iterable[int], batch_size: int, after: int = 0
+) -> Iterator[List[int]]:
+    """Iterate over batches of message IDs of the given chats, in ascending ID order.
+
+    Only messages with ID greater than `after` are included so an interrupted
+    export can be resumed from the last exported message ID. Only the IDs are
+    kept in memory, packed in one sorted array per chat, the arrays are merged
+    lazily and the messages are fetched later in batches.
+    """
+    chats = []
+    for chatid in chatids:
+        msgids = rpc.get_message_ids(accid, chatid, False, False)
+        # the IDs are sorted by timestamp, not by ID, if messages arrived late
+        chats.append(array("L", sorted(msgid for msgid in msgids if msgid > after)))
+    batch: List[int] = []
+    for msgid in heapq.merge(*chats):
+        batch.append(msgid)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_messages(rpc: Rpc, accid: int, batches: Iterable[List[int]]) -> Iterator[Any]:
+    """Fetch the messages of each batch of IDs with a single RPC call per batch."""
+    for batch in batches:
+        results = rpc.get_messages(accid, batch)
+        for msgid in batch:
+            msg = results.get(str(msgid))
+            if msg and msg.get("kind") != "loadingError":
+                yield msg
+
+
+def to_record(msg: Any) -> dict:
+    """Convert a message to a flat record with the EXPORT_FIELDS keys."""
+    sender = msg.sender
+    return {
+        "id": msg.id,
+        "chat_id": msg.chat_id,
+        "timestamp": msg.timestamp,
+        "sender_id": sender.id,
+        "sender_addr": sender.address,
+        "sender_name": msg.override_sender_name or sender.display_name,
+        "text": msg.text,
+        "file_name": msg.file_name,
+        "is_info": msg.is_info,
+        "state": msg.state,
+    }
+
+
+class ExportWriter:
+    """Write message records to a JSONL or CSV stream"""
+
+    def __init__(self, stream: TextIO, fmt: str, header: bool = True) -> None:
+        self.stream = stream
+        self.fmt = fmt
+        self._csv: Optional[Any] = None
+        if fmt == "csv":
+            self._csv = csv.DictWriter(stream, fieldnames=EXPORT_FIELDS)
+            if header:
+                self._csv.writeheader()
+
+    def write(self, record: dict) -> None:
+        if self._csv:
+            self._csv.writerow(record)
+        else:
+            self.stream.write(json.dumps(record, ensure_ascii=False))
+            self.stream.write("\n")
+
+
+class Throughput:
+    """Report export progress to stderr at most once per interval"""
+
+    def __init__(self, interval: float = 2.0, stream: TextIO = sys.stderr) -> None:
+        self.interval = interval
+        self.stream = stream
+        self.count = 0
+        self.last_id = 0
+        self._start = self._last_report = time.monotonic()
+
+    def update(self, msgid: int) -> None:
+        self.count += 1
+        self.last_id = max(self.last_id, msgid)
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def report(self) -> None:
+        elapsed = max(time.monotonic() - self._start, 1e-6)
+        rate = self.count / elapsed
+        self.stream.write(
+            f"exported {self.count} messages in {elapsed:.1f}s ({rate:.0f} msg/s),"
+            f" last message ID: {self.last_id}\n"
+        )
+        self.stream.flush()
+
+
+def export_messages(
+    rpc: Rpc,
+    accid: int,
+    chatids: Iterable[int],
+    writer: ExportWriter,
+    *,
+    batch_size: int = 200,
+    after: int = 0,
+    progress: Optional[Throughput] = None,
+) -> int:
+    """Export the messages of the given chats, returning the number of exported messages."""
+    progress = progress or Throughput()
+    batches = iter_msg_id_batches(rpc, accid, chatids, batch_size, after)
+    for msg in iter_messages(rpc, accid, batches):
+        writer.write(to_record(msg))
+        progress.update(msg.id)
+    progress.report()
+    return progress.count
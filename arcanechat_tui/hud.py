@@ -0,0 +1,71 @@
+"""Performance HUD widget"""
+
+import time
+
+import urwid
+from deltachat2 import Client, CoreEvent
+
+from .cache import CacheBudget
+from .logger import get_rate_limit_filter
+from .metrics import Counter, MeteredTransport, get_rss
+from .render import MeasuredMainLoop
+
+MB = 1024 * 1024
+
+
+class PerformanceHud(urwid.AttrMap):
+    """One-line overlay displaying live performance metrics"""
+
+    def __init__(self, client: Client, loop: MeasuredMainLoop, cache_budget: CacheBudget) -> None:
+        self.client = client
+        self.loop = loop
+        self.cache_budget = cache_budget
+        self.events = Counter()
+        self._rpc_calls = 0
+        self._rpc_latency = 0.0
+        self._paints = 0
+        self._last_update = time.monotonic()
+        self._label = urwid.Text("", wrap="ellipsis")
+        super().__init__(self._label, "status_bar")
+
+    def count_event(self, _client: Client, _accid: int, _event: CoreEvent) -> None:
+        """Client hook counting the core events."""
+        self.events.increment()
+
+    def update(self) -> None:
+        """Refresh the displayed metrics."""
+        now = time.monotonic()
+        elapsed = max(now - self._last_update, 1e-6)
+        self._last_update = now
+        parts = [self._rpc_stats(elapsed), f"events {self.events.rate():.0f}/s"]
+
+        paint_stats = self.loop.stats()
+        paints = (paint_stats["paints"] - self._paints) / elapsed
+        self._paints = paint_stats["paints"]
+        last_paint = paint_stats["last_paint_duration"] * 1000
+        parts.append(f"paints {paints:.1f}/s last {last_paint:.1f}ms")
+
+        cache_stats = self.cache_budget.stats()
+        caches = " ".join(
+            f"{cache['name']} {cache['hit_rate']:.0%}/{cache['entries']}"
+            for cache in cache_stats["caches"]
+        )
+        used, limit = cache_stats["used_bytes"] / MB, cache_stats["max_bytes"] / MB
+        parts.append(f"cache {caches} {used:.1f}/{limit:.0f}MB")
+
+        parts.append(f"rss {get_rss() / MB:.0f}MB")
+
+        rate_filter = get_rate_limit_filter(self.client.logger)
+        if rate_filter:
+            parts.append(f"logs dropped {sum(rate_filter.stats().values())}")
+        self._label.set_text(" " + " | ".join(parts))
+
+    def _rpc_stats(self, elapsed: float) -> str:
+        transport = self.client.rpc.transport
+        if not isinstance(transport, MeteredTransport):
+            return "rpc n/a"
+        calls = transport.calls - self._rpc_calls
+        latency = transport.total_latency - self._rpc_latency
+        self._rpc_calls, self._rpc_latency = transport.calls, transport.total_latency
+        avg_latency = latency / calls * 1000 if calls else 0.0
+        return f"rpc {calls / elapsed:.1f}/s {avg_latency:.1f}ms"
@@ -1,32 +1,50 @@
 """A ListWalker that creates the widgets dynamically as needed."""
 
-from functools import lru_cache
-from typing import Any, Callable, Iterable, NoReturn
+from typing import Any, Callable, Hashable, Iterable, NoReturn
 
 import urwid
 
+from .cache import DEFAULT_BUDGET, CacheBudget, WidgetCache
+
 
 class LazyListWalker(urwid.SimpleListWalker):
-    """A ListWalker that creates the widgets dynamically as needed."""
+    """A ListWalker that creates the widgets dynamically as needed.
+
+    The created widgets are kept in a WidgetCache, the cache entries are
+    keyed by the list items so they must be hashable.
+    """
 
     def __init__(
         self,
         contents: Iterable,
         widget_factory: Callable[[Any], urwid.Widget],
-        cache_size=1000,
+        name: str = "",
+        budget: CacheBudget = DEFAULT_BUDGET,
         wrap_around: bool = False,
     ) -> None:
-        self.cache_size = cache_size
-        self._widget_factory = widget_factory
-        self.widget_factory = lru_cache(maxsize=cache_size)(widget_factory)
+        self.widget_factory = widget_factory
+        self.cache = WidgetCache(name or widget_factory.__name__, budget)
         super().__init__(contents, wrap_around)
 
     def clear_cache(self) -> None:
-        self.widget_factory = lru_cache(maxsize=self.cache_size)(self._widget_factory)
+        self.cache.clear()
+
+    def invalidate(self, item: Hashable) -> None:
+        """Remove the widget created for the given item from the cache."""
+        self.cache.invalidate(item)
+
+    def get_item(self, position: int) -> Any:
+        """Return the list item at position, not the widget created for it."""
+        return super().__getitem__(position)
 
     def __getitem__(self, position: int) -> urwid.Widget:
         """return widget at position or raise an IndexError or KeyError"""
-        return self.widget_factory(super().__getitem__(position))
+        item = super().__getitem__(position)
+        widget = self.cache.get(item)
+        if widget is None:
+            widget = self.widget_factory(item)
+            self.cache.put(item, widget)
+        return widget
 
     def set_modified_callback(self, callback: Callable[[], Any]) -> NoReturn:
         """Ignore this, just copied from SimpleListWalker to avoid pylint warning"""
@@ -1,29 +1,160 @@
 """Logging to log files"""
 
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
 from . import APP_NAME
 
 
-def create_logger(level: str, folder: Path) -> logging.Logger:
+class RateLimitFilter(logging.Filter):
+    """Allow at most `rate` records per second for each message type.
+
+    The message type is taken from the record's `msg_type` attribute, if present,
+    or the record's level otherwise. The number of records dropped in the previous
+    window is attached to the next record that passes as the `suppressed` attribute.
+    Warnings and errors are never dropped.
+    """
+
+    def __init__(self, rate: int) -> None:
+        super().__init__()
+        self.rate = rate
+        self.suppressed: Dict[str, int] = {}
+        self._windows: Dict[str, Tuple[int, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = str(getattr(record, "msg_type", record.levelname))
+        window = int(time.monotonic())
+        with self._lock:
+            start, count, dropped = self._windows.get(key, (window, 0, 0))
+            if start != window:
+                start, count = window, 0
+            if count >= self.rate:
+                self._windows[key] = (start, count, dropped + 1)
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return False
+            self._windows[key] = (start, count + 1, 0)
+        record.suppressed = dropped
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of records dropped so far for each message type."""
+        with self._lock:
+            return dict(self.suppressed)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text formatter that notes how many similar records were suppressed"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            text += f" ({suppressed} similar messages suppressed)"
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as JSON objects, one per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": record.created,
+            "level": record.levelname,
+            "name": record.name,
+            "type": getattr(record, "msg_type", None),
+            "message": record.getMessage(),
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            data["suppressed"] = suppressed
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class _QueueHandler(QueueHandler):
+    """Queue handler that leaves the formatting to the listener's thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def create_logger(level: str, folder: Path, fmt: str = "text", rate: int = 0) -> logging.Logger:
+    """Create the application logger.
+
+    Records are put in a queue and written to disk by a background thread,
+    if rate is not zero, at most that many records per second are logged
+    for each message type.
+    """
     logger = logging.Logger(APP_NAME)
     logger.parent = None
 
     if level == "disabled":
         logger.disabled = True
         return logger
+    logger.setLevel(level.upper())
 
-    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if fmt == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = TextFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 
     log_path = folder / "logs"
     log_path.mkdir(parents=True, exist_ok=True)
-    log_path /= "log.txt"
+    log_path /= "log.jsonl" if fmt == "json" else "log.txt"
 
     fhandler = RotatingFileHandler(log_path, backupCount=3, maxBytes=2000000)
     fhandler.setLevel(level.upper())
     fhandler.setFormatter(formatter)
-    logger.addHandler(fhandler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    qhandler = _QueueHandler(log_queue)
+    if rate:
+        qhandler.addFilter(RateLimitFilter(rate))
+    logger.addHandler(qhandler)
+
+    listener = QueueListener(log_queue, fhandler, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, logger, qhandler, listener)
 
     return logger
+
+
+def get_rate_limit_filter(logger: logging.Logger) -> Optional[RateLimitFilter]:
+    """Get the rate limit filter of a logger created with create_logger(), if any."""
+    for handler in logger.handlers:
+        for log_filter in handler.filters:
+            if isinstance(log_filter, RateLimitFilter):
+                return log_filter
+    return None
+
+
+def _stop_listener(logger: logging.Logger, qhandler: QueueHandler, listener: QueueListener) -> None:
+    """Log a summary of the suppressed records, then stop the listener."""
+    rate_filter = get_rate_limit_filter(logger)
+    suppressed = rate_filter.stats() if rate_filter else {}
+    if suppressed:
+        counts = ", ".join(f"{key}: {count}" for key, count in sorted(suppressed.items()))
+        # enqueued directly so the summary doesn't go through the rate limit
+        qhandler.enqueue(
+            logger.makeRecord(
+                logger.name,
+                logging.WARNING,
+                __file__,
+                0,
+                "%s messages suppressed by the log rate limit (%s)",
+                (sum(suppressed.values()), counts),
+                None,
+            )
+        )
+    listener.stop()
@@ -8,7 +8,9 @@ from deltachat2 import Client, CoreEvent, EventType, IOTransport, Rpc, events
 from .application import Application
 from .cli import Cli
 from .logger import create_logger
+from .metrics import MeteredTransport
 from .util import get_account
+from .watchdog import RpcWatchdog, SupervisedTransport
 
 FG_COLOR = "white"
 BG_COLOR = "g11"
@@ -36,18 +38,21 @@ dkeymap = {
     "insert_new_line": "meta enter",
     "next_chat": "meta up",
     "prev_chat": "meta down",
+    "toggle_msg": "e",
+    "toggle_hud": "f2",
 }
 hooks = events.HookCollection()
 
 
 @hooks.on(events.RawEvent)
 def log_event(client: Client, accid: int, event: CoreEvent) -> None:
+    extra = {"msg_type": event.kind}
     if event.kind == EventType.INFO:
-        client.logger.debug("[acc=%s] %s", accid, event.msg)
+        client.logger.debug("[acc=%s] %s", accid, event.msg, extra=extra)
     elif event.kind == EventType.WARNING:
-        client.logger.warning("[acc=%s] %s", accid, event.msg)
+        client.logger.warning("[acc=%s] %s", accid, event.msg, extra=extra)
     elif event.kind == EventType.ERROR:
-        client.logger.error("[acc=%s] %s", accid, event.msg)
+        client.logger.error("[acc=%s] %s", accid, event.msg, extra=extra)
 
 
 def main() -> None:
@@ -55,10 +60,31 @@ def main() -> None:
     args.program_folder.mkdir(parents=True, exist_ok=True)
     accounts_dir = args.program_folder / "accounts"
     logging.getLogger("deltachat2.IOTransport").disabled = True
-    with IOTransport(accounts_dir=accounts_dir, stderr=subprocess.DEVNULL) as trans:
-        client = Client(Rpc(trans), hooks, create_logger(args.log, args.program_folder))
+    with SupervisedTransport(
+        lambda: IOTransport(accounts_dir=accounts_dir, stderr=subprocess.DEVNULL)
+    ) as trans:
+        client = Client(
+            Rpc(MeteredTransport(trans)),
+            hooks,
+            create_logger(args.log, args.program_folder, args.log_format, args.log_rate),
+        )
         if "cmd" in args:
             args.cmd(client, args)
         else:
             accid = get_account(client.rpc, args.account)
-            Application(client, keymap=dkeymap, theme=dtheme).run(accid)
+            watchdog = RpcWatchdog(
+                trans,
+                degraded_after=args.rpc_slow,
+                restart_after=args.rpc_timeout,
+                logger=client.logger,
+            )
+            app = Application(
+                client,
+                keymap=dkeymap,
+                theme=dtheme,
+                max_fps=args.max_fps,
+                paste_file_size=args.paste_file_size,
+                collapse_lines=args.collapse_lines,
+                watchdog=watchdog,
+            )
+            app.run(accid)
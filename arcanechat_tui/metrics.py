@@ -0,0 +1,72 @@
+"""Performance metrics"""
+
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Any
+
+
+class MeteredTransport:
+    """RPC transport wrapper that counts calls and measures their latency.
+
+    Calls to get_next_event are not measured since they block until there is an event.
+    """
+
+    IGNORED_METHODS = ("get_next_event",)
+
+    def __init__(self, transport: Any) -> None:
+        self.transport = transport
+        self.calls = 0
+        self.total_latency = 0.0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.transport, attr)
+
+    def call(self, method: str, *args) -> Any:
+        if method in self.IGNORED_METHODS:
+            return self.transport.call(method, *args)
+        start = time.monotonic()
+        try:
+            return self.transport.call(method, *args)
+        finally:
+            latency = time.monotonic() - start
+            with self._lock:
+                self.calls += 1
+                self.total_latency += latency
+
+
+class Counter:
+    """Thread-safe counter that can report its rate of change"""
+
+    def __init__(self) -> None:
+        self.value = 0
+        self._lock = threading.Lock()
+        self._last_value = 0
+        self._last_time = time.monotonic()
+
+    def increment(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def rate(self) -> float:
+        """Get the change per second since the last time this method was called."""
+        now = time.monotonic()
+        with self._lock:
+            delta = self.value - self._last_value
+            elapsed = now - self._last_time
+            self._last_value, self._last_time = self.value, now
+        return delta / elapsed if elapsed > 0 else 0.0
+
+
+def get_rss() -> int:
+    """Get the resident memory of the process in bytes."""
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # fallback to the peak RSS, reported in KB in Linux but in bytes in macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
@@ -0,0 +1,109 @@
+"""Background prefetching of chats the user is likely to open next"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from deltachat2 import Client
+
+Prefetched = Tuple[list, Dict[int, dict]]
+
+
+class Prefetcher:
+    """Load in background the message list and the newest messages of some chats.
+
+    Only one chat is fetched at a time in a single worker thread, and at most
+    `max_chats` chats are fetched for each prefetch request, so the RPC server
+    is not flooded with requests.
+    """
+
+    def __init__(self, client: Client, max_chats: int = 4, window: int = 50) -> None:
+        """
+        :param max_chats: maximum number of chats fetched per prefetch request
+        :param window: number of newest messages to fetch for each chat
+        """
+        self.client = client
+        self.max_chats = max_chats
+        self.window = window
+        self._results: "OrderedDict[Tuple[int, int], Prefetched]" = OrderedDict()
+        self._request: Optional[Tuple[int, List[int], List[int]]] = None
+        self._fetching: Optional[Tuple[int, int]] = None
+        self._stale = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def prefetch(self, accid: int, chatids: List[int], candidates: List[int]) -> None:
+        """Request the given chats to be prefetched.
+
+        :param chatids: chats to prefetch, in order of priority
+        :param candidates: chats that will be prefetched only if they have unread messages
+        """
+        with self._cond:
+            self._request = (accid, chatids, candidates)
+            if not self._thread:
+                self._thread = threading.Thread(target=self._worker, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def pop(self, chat: Tuple[int, int]) -> Optional[Prefetched]:
+        """Take the prefetched message list items and messages of the given chat if available."""
+        with self._cond:
+            return self._results.pop(chat, None)
+
+    def messages_changed(self, _client: Client, accid: int, chatid: int, _msgid: int) -> None:
+        with self._cond:
+            if self._fetching and self._fetching[0] == accid and chatid in (self._fetching[1], 0):
+                self._stale = True
+            for chat in list(self._results):
+                if chat[0] == accid and chatid in (chat[1], 0):
+                    del self._results[chat]
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._request:
+                    self._cond.wait()
+                accid, chatids, candidates = self._request
+                self._request = None
+            try:
+                self._process(accid, chatids, candidates)
+            except Exception as ex:
+                self.client.logger.exception(ex)
+
+    def _process(self, accid: int, chatids: List[int], candidates: List[int]) -> None:
+        chatids = list(chatids)
+        candidates = [chatid for chatid in candidates if chatid not in chatids]
+        if candidates:
+            items = self.client.rpc.get_chatlist_items_by_entries(accid, candidates)
+            for chatid in candidates:
+                item = items.get(str(chatid))
+                if item and item.get("fresh_message_counter"):
+                    chatids.append(chatid)
+
+        fetched = 0
+        for chatid in chatids:
+            if fetched >= self.max_chats:
+                break
+            with self._cond:
+                if self._request:
+                    break  # a newer request is waiting
+                if (accid, chatid) in self._results:
+                    continue
+                self._fetching, self._stale = (accid, chatid), False
+            fetched += 1
+            result = self._fetch(accid, chatid)
+            with self._cond:
+                self._fetching = None
+                if not self._stale:  # discard if the chat changed while it was fetched
+                    self._results[(accid, chatid)] = result
+                    while len(self._results) > self.max_chats * 2:
+                        self._results.popitem(last=False)
+
+    def _fetch(self, accid: int, chatid: int) -> Prefetched:
+        rpc = self.client.rpc
+        items = rpc.get_message_list_items(accid, chatid, False, True)
+        msgids = [item.msg_id for item in items if item.kind == "message"][-self.window :]
+        msgs = rpc.get_messages(accid, msgids) if msgids else {}
+        return items, {
+            int(msgid): msg for msgid, msg in msgs.items() if msg.get("kind") != "loadingError"
+        }
@@ -0,0 +1,113 @@
+"""Frame-budgeted screen painting"""
+
+import os
+import threading
+import time
+from typing import Callable, List, Optional, Set
+
+import urwid
+
+
+class MeasuredMainLoop(urwid.MainLoop):
+    """Main loop that measures every paint of the screen"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.paint_count = 0
+        self.last_paint = 0.0
+        self.last_paint_duration = 0.0
+        self.total_paint_duration = 0.0
+
+    def draw_screen(self) -> None:
+        start = time.monotonic()
+        super().draw_screen()
+        self.last_paint = time.monotonic()
+        self.last_paint_duration = self.last_paint - start
+        self.total_paint_duration += self.last_paint_duration
+        self.paint_count += 1
+
+    def stats(self) -> dict:
+        """Return paint statistics."""
+        count = self.paint_count
+        return {
+            "paints": count,
+            "last_paint_duration": self.last_paint_duration,
+            "avg_paint_duration": self.total_paint_duration / count if count else 0.0,
+        }
+
+
+class RenderScheduler:
+    """Coalesce repaint requests so the screen is painted at most max_fps times per second.
+
+    Widgets are marked as dirty, and callbacks updating widgets are queued, from
+    any thread. A single pacing thread wakes the main loop once the frame interval
+    since the last paint passed, and the main loop runs the callbacks and paints
+    the screen after handling the wake up, once no matter how many widgets were
+    marked dirty in the meantime.
+    """
+
+    def __init__(self, loop: MeasuredMainLoop, max_fps: float = 30) -> None:
+        self.loop = loop
+        self.interval = 1 / max_fps if max_fps > 0 else 0.0
+        self._dirty: Set[urwid.Widget] = set()
+        self._callbacks: List[Callable[[], None]] = []
+        self._pending = False  # there are repaint requests
+        self._woken = False  # the main loop was woken and didn't handle it yet
+        self._last_wake = 0.0
+        self._cond = threading.Condition()
+        self._pipe: Optional[int] = loop.watch_pipe(self._on_wake)
+        threading.Thread(target=self._pace, daemon=True).start()
+
+    def mark_dirty(self, widget: Optional[urwid.Widget] = None) -> None:
+        """Request the given widget to be repainted in the next frame."""
+        with self._cond:
+            if widget is not None:
+                self._dirty.add(widget)
+            self._request_frame()
+
+    def call_soon(self, callback: Callable[[], None]) -> None:
+        """Run the given callback in the main loop thread before the next paint."""
+        with self._cond:
+            self._callbacks.append(callback)
+            self._request_frame()
+
+    def close(self) -> None:
+        with self._cond:
+            if self._pipe is not None:
+                self.loop.remove_watch_pipe(self._pipe)
+                os.close(self._pipe)
+                self._pipe = None
+            self._cond.notify()
+
+    def _request_frame(self) -> None:
+        if not self._pending:
+            self._pending = True
+            self._cond.notify()
+
+    def _pace(self) -> None:
+        with self._cond:
+            while self._pipe is not None:
+                if not self._pending or self._woken:
+                    self._cond.wait()
+                    continue
+                last_paint = max(self.loop.last_paint, self._last_wake)
+                delay = last_paint + self.interval - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                self._woken = True
+                os.write(self._pipe, b"\n")
+
+    def _on_wake(self, _data: bytes) -> bool:
+        with self._cond:
+            self._pending = self._woken = False
+            self._last_wake = time.monotonic()
+            dirty, self._dirty = self._dirty, set()
+            callbacks, self._callbacks = self._callbacks, []
+            self._cond.notify()
+        for callback in callbacks:
+            callback()
+        for widget in dirty:
+            widget._invalidate()  # pylint: disable=protected-access
+        # the main loop paints the screen when it becomes idle after this callback
+        return True
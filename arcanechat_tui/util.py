@@ -1,11 +1,23 @@
 """Utilities"""
 
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
+import urwid
 from deltachat2 import ChatType, Rpc
 
 
+@lru_cache(maxsize=None)
+def get_style(foreground: str, background: str) -> urwid.AttrSpec:
+    """Get the display attribute for the given colors.
+
+    Each pair of colors is parsed only once and the same AttrSpec object is
+    returned every time so urwid can reuse the rendered canvases.
+    """
+    return urwid.AttrSpec(foreground, background)
+
+
 def shorten_text(text: str, width: int, placeholder: str = "…") -> str:
     text = " ".join(text.split())
     if len(text) > width:
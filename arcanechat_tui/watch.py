@@ -0,0 +1,90 @@
+"""Headless streaming of core events"""
+
+import json
+import queue
+import time
+from typing import Any, Dict, List, Optional, Set, TextIO, Tuple
+
+from deltachat2 import Client, CoreEvent
+
+QueuedEvent = Tuple[float, int, CoreEvent]
+
+
+class EventStreamer:
+    """Write core events to a stream as JSON objects, one per line.
+
+    Events are queued by the client's event thread and written in batches, the
+    queue is bounded so a slow consumer blocks the event processing instead of
+    making the queue grow without limit.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        stream: TextIO,
+        *,
+        kinds: Optional[Set[str]] = None,
+        accid: int = 0,
+        fetch_messages: bool = False,
+        batch_size: int = 500,
+        queue_size: int = 5000,
+    ) -> None:
+        """
+        :param kinds: the event types to stream, all events are streamed if not set
+        :param accid: if not zero, only the events of this account are streamed
+        :param fetch_messages: if True, the message of the events related to
+                               a message is included in the output
+        """
+        self.client = client
+        self.stream = stream
+        self.kinds = kinds
+        self.accid = accid
+        self.fetch_messages = fetch_messages
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[QueuedEvent]" = queue.Queue(maxsize=queue_size)
+
+    def on_event(self, _client: Client, accid: int, event: CoreEvent) -> None:
+        """Client hook, to be registered for RawEvent."""
+        if self.accid and accid != self.accid:
+            return
+        if self.kinds and event.kind not in self.kinds:
+            return
+        self._queue.put((time.time(), accid, event))  # blocks if the consumer is slow
+
+    def run(self) -> None:
+        """Write the queued events forever."""
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[QueuedEvent]) -> None:
+        messages = self._get_messages(batch) if self.fetch_messages else {}
+        lines = []
+        for timestamp, accid, event in batch:
+            data: Dict[str, Any] = {"time": timestamp, "account": accid, "event": event}
+            msg = messages.get((accid, event.get("msg_id") or 0))
+            if msg:
+                data["message"] = msg
+            lines.append(json.dumps(data, ensure_ascii=False))
+        lines.append("")
+        self.stream.write("\n".join(lines))
+        self.stream.flush()
+
+    def _get_messages(self, batch: List[QueuedEvent]) -> Dict[Tuple[int, int], Any]:
+        """Fetch the messages related to the events with one call per account."""
+        msgids: Dict[int, Set[int]] = {}
+        for _, accid, event in batch:
+            if event.get("msg_id"):
+                msgids.setdefault(accid, set()).add(event.msg_id)
+        messages = {}
+        for accid, ids in msgids.items():
+            results = self.client.rpc.get_messages(accid, list(ids))
+            for msgid, msg in results.items():
+                if msg.get("kind") != "loadingError":
+                    messages[(accid, int(msgid))] = msg
+        return messages
@@ -0,0 +1,205 @@
+"""Health monitoring of the RPC server"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import urwid
+from deltachat2 import JsonRpcError
+
+RPC_STATUS_CHANGED = "rpc_status_changed"
+RPC_RESTARTED = "rpc_restarted"
+
+STATUS_OK = "ok"
+STATUS_DEGRADED = "degraded"
+STATUS_RESTARTING = "restarting"
+
+# methods that are sent again to the new server if it is restarted while waiting for them,
+# other methods could have already been run by a slow server and must not run twice
+READ_ONLY_PREFIXES = ("get_", "batch_get_", "is_", "search_")
+IDEMPOTENT_METHODS = {
+    "marknoticed_chat",
+    "markseen_msgs",
+    "start_io",
+    "start_io_for_all_accounts",
+    "stop_io",
+    "stop_io_for_all_accounts",
+}
+
+# error set as response of the calls that were waiting when the server was replaced
+_RESTARTED_ERROR = {"code": -32000, "message": "RPC server restarted"}
+
+
+def is_retriable(method: str) -> bool:
+    """Return True if the given method can be safely sent again after a restart."""
+    if method.startswith("get_or_create_"):
+        return False
+    return method in IDEMPOTENT_METHODS or method.startswith(READ_ONLY_PREFIXES)
+
+
+class SupervisedTransport:
+    """RPC transport that can replace its RPC server process with a new one.
+
+    The read-only calls waiting for a response from the replaced server are sent
+    again to the new server, other calls fail with JsonRpcError.
+    """
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        """
+        :param factory: callable returning a new IOTransport, not started yet
+        """
+        self.factory = factory
+        self.restarts = 0
+        self.transport = factory()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.transport, attr)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, _exc_type, _exc, _tb):
+        self.close()
+
+    def start(self) -> None:
+        self.transport.start()
+
+    def close(self) -> None:
+        self.transport.close()
+
+    def call(self, method: str, *args, retry: bool = True) -> Any:
+        """Call the given RPC method.
+
+        :param retry: if False, JsonRpcError is raised if the server is restarted
+                      while waiting for the response instead of sending the call again,
+                      calls that are not read-only are never sent again
+        """
+        retry = retry and is_retriable(method)
+        while True:
+            with self._lock:  # wait if the server is being restarted
+                transport = self.transport
+            try:
+                return transport.call(method, *args)
+            except JsonRpcError as ex:
+                if not retry or ex.args[0] is not _RESTARTED_ERROR:
+                    raise
+
+    def restart(self) -> None:
+        """Kill the current RPC server and start a new one."""
+        with self._lock:
+            # the old server must release the accounts before the new one starts
+            _kill(self.transport)
+            transport = self.factory()
+            transport.start()
+            self.transport = transport
+            self.restarts += 1
+
+
+def _kill(transport: Any) -> None:
+    """Kill the server of the given IOTransport and fail its pending calls."""
+    transport.closing = True
+    transport.request_queue.put(None)
+    transport.process.kill()
+    transport.process.wait()
+    transport.reader_thread.join(1)
+    transport.writer_thread.join(1)
+    for result in list(transport.pending_results.values()):
+        result.set({"error": _RESTARTED_ERROR})
+    transport.pending_results.clear()
+
+
+class RpcWatchdog:
+    """Measure the response time of the RPC server and restart it if it stops responding.
+
+    The server is pinged every `interval` seconds, the status is degraded while
+    the response takes longer than `degraded_after` seconds and the server is
+    restarted if there is no response after `restart_after` seconds or if the
+    server process died. If `restart_after` is zero the server is never restarted.
+    """
+
+    signals = [RPC_STATUS_CHANGED, RPC_RESTARTED]
+    # this method needs the accounts lock, so it stalls if the core is stalled
+    PING_METHOD = "get_all_account_ids"
+
+    def __init__(
+        self,
+        transport: SupervisedTransport,
+        *,
+        interval: float = 5,
+        degraded_after: float = 2,
+        restart_after: float = 30,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        urwid.register_signal(self.__class__, self.signals)
+        self.transport = transport
+        self.interval = interval
+        self.degraded_after = degraded_after
+        self.restart_after = max(restart_after, degraded_after) if restart_after > 0 else 0
+        self.logger = logger or logging
+        self.status = STATUS_OK
+        self.latency = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start checking the server in a background thread."""
+        if not self._thread:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def check(self) -> None:
+        """Ping the server once and restart it if it died or doesn't respond."""
+        if self.restart_after and self.transport.process.poll() is not None:
+            self.logger.warning("RPC server exited with code %s", self.transport.process.returncode)
+        elif self._measure_latency():
+            return
+        else:
+            self.logger.warning("RPC server not responding after %ss", self.restart_after)
+        self._restart()
+        # update the status with the response time of the new server
+        self._measure_latency()
+
+    def _measure_latency(self) -> bool:
+        """Ping the server and update the status, return False if it didn't respond in time."""
+        done = threading.Event()
+        threading.Thread(target=self._ping, args=(done,), daemon=True).start()
+        start = time.monotonic()
+        if not done.wait(self.degraded_after):
+            self._set_status(STATUS_DEGRADED, time.monotonic() - start)
+            timeout = self.restart_after - self.degraded_after if self.restart_after else None
+            if not done.wait(timeout):
+                return False
+        latency = time.monotonic() - start
+        self._set_status(STATUS_DEGRADED if latency > self.degraded_after else STATUS_OK, latency)
+        return True
+
+    def _ping(self, done: threading.Event) -> None:
+        try:
+            self.transport.call(self.PING_METHOD, retry=False)
+        except JsonRpcError:
+            pass
+        finally:
+            done.set()
+
+    def _restart(self) -> None:
+        self._set_status(STATUS_RESTARTING, self.latency)
+        self.transport.restart()
+        self.logger.warning("RPC server restarted (%s restarts)", self.transport.restarts)
+        urwid.emit_signal(self, RPC_RESTARTED, self)
+
+    def _set_status(self, status: str, latency: float) -> None:
+        self.status, self.latency = status, latency
+        urwid.emit_signal(self, RPC_STATUS_CHANGED, self, status, latency)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as ex:
+                self.logger.exception(ex)
@@ -0,0 +1,71 @@
+"""Shared test fixtures"""
+
+import fcntl
+import os
+import sys
+from pathlib import Path
+
+import pytest
+import urwid
+from deltachat2 import IOTransport
+
+from arcanechat_tui.watchdog import (
+    RPC_RESTARTED,
+    RPC_STATUS_CHANGED,
+    RpcWatchdog,
+    SupervisedTransport,
+    _kill,
+)
+
+FAKE_SERVER = Path(__file__).parent / "fake_rpc_server.py"
+
+
+def is_locked(accounts_dir: Path) -> bool:
+    """Check if a server holds the lock of the given accounts folder."""
+    path = accounts_dir / "accounts.lock"
+    if not path.exists():
+        return False
+    with open(path, "w", encoding="utf-8") as file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(file, fcntl.LOCK_UN)
+    return False
+
+
+@pytest.fixture(name="transport")
+def fixture_transport(tmp_path, monkeypatch):
+    """SupervisedTransport running the stand-in server as deltachat-rpc-server"""
+    script = tmp_path / "deltachat-rpc-server"
+    script.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_SERVER}"\n')
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    accounts_dir = tmp_path / "accounts"
+
+    def create_transport() -> IOTransport:
+        # a server still holding the accounts would make the new server exit
+        assert not is_locked(accounts_dir), "the previous server is still running"
+        return IOTransport(accounts_dir=accounts_dir)
+
+    trans = SupervisedTransport(create_transport)
+    trans.start()
+    yield trans
+    # the server may be stalled, so it is killed instead of closed
+    _kill(trans.transport)
+
+
+@pytest.fixture(name="history")
+def fixture_history():
+    """Status changes and restarts reported by the watchdog"""
+    return []
+
+
+@pytest.fixture(name="watchdog")
+def fixture_watchdog(transport, history):
+    wdog = RpcWatchdog(transport, degraded_after=0.2, restart_after=1)
+    urwid.connect_signal(
+        wdog, RPC_STATUS_CHANGED, lambda _wdog, status, _latency: history.append(status)
+    )
+    urwid.connect_signal(wdog, RPC_RESTARTED, lambda _wdog: history.append("restarted"))
+    return wdog
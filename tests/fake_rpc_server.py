@@ -0,0 +1,40 @@
+"""Stand-in for deltachat-rpc-server.
+
+Every call is answered with the process ID of the server, except get_next_event
+that is never answered. Sending SIGUSR1 to the process makes it stop answering,
+like a stalled server. Like the real server, it exits if the accounts folder
+in DC_ACCOUNTS_PATH is locked by another server.
+"""
+
+import fcntl
+import json
+import os
+import signal
+import sys
+import threading
+
+STALLED = threading.Event()
+
+
+def main() -> None:
+    accounts_dir = os.environ["DC_ACCOUNTS_PATH"]
+    os.makedirs(accounts_dir, exist_ok=True)
+    # pylint: disable=consider-using-with
+    lock = open(os.path.join(accounts_dir, "accounts.lock"), "w", encoding="utf-8")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        sys.exit("accounts folder is locked by another server")
+
+    signal.signal(signal.SIGUSR1, lambda _signum, _frame: STALLED.set())
+    for line in sys.stdin:
+        request = json.loads(line)
+        if STALLED.is_set() or request["method"] == "get_next_event":
+            continue
+        response = {"jsonrpc": "2.0", "id": request["id"], "result": os.getpid()}
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Tests for the RPC server watchdog"""
+
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+import urwid
+from deltachat2 import JsonRpcError
+
+from arcanechat_tui.watchdog import (
+    RPC_STATUS_CHANGED,
+    STATUS_DEGRADED,
+    STATUS_OK,
+    STATUS_RESTARTING,
+    RpcWatchdog,
+    SupervisedTransport,
+)
+
+
+def in_thread(func, *args) -> Future:
+    """Run the function in a daemon thread, so a hanging call doesn't block the tests."""
+    future: Future = Future()
+
+    def run() -> None:
+        try:
+            future.set_result(func(*args))
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            future.set_exception(ex)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def stall(transport: SupervisedTransport) -> None:
+    transport.call("get_system_info")  # wait for the server to be ready
+    os.kill(transport.process.pid, signal.SIGUSR1)
+    time.sleep(0.1)
+
+
+def test_responsive_server(watchdog, history) -> None:
+    watchdog.check()
+    assert history == [STATUS_OK]
+    assert watchdog.transport.restarts == 0
+
+
+def test_stalled_server_is_restarted(transport, watchdog, history) -> None:
+    old_pid = transport.process.pid
+    stall(transport)
+    pending = in_thread(transport.call, "get_system_info")
+    watchdog.check()
+    # the call waiting on the stalled server is sent again to the new one
+    assert pending.result(timeout=5) == transport.process.pid
+
+    assert transport.process.pid != old_pid
+    assert transport.restarts == 1
+    assert history == [STATUS_DEGRADED, STATUS_RESTARTING, "restarted", STATUS_OK]
+
+
+def test_pending_calls_not_read_only_fail(transport, watchdog) -> None:
+    stall(transport)
+    pending = in_thread(transport.call, "send_msg", 1, 10, {"text": "hello"})
+    watchdog.check()
+    # the stalled server could have sent the message already
+    with pytest.raises(JsonRpcError):
+        pending.result(timeout=5)
+    assert transport.restarts == 1
+    assert transport.call("get_system_info") == transport.process.pid
+
+
+def test_dead_server_is_restarted(transport, watchdog, history) -> None:
+    transport.process.kill()
+    transport.process.wait()
+    watchdog.check()
+    assert transport.restarts == 1
+    assert history == [STATUS_RESTARTING, "restarted", STATUS_OK]
+    assert transport.call("get_system_info") == transport.process.pid
+
+
+def test_restart_disabled(transport, history) -> None:
+    wdog = RpcWatchdog(transport, degraded_after=0.2, restart_after=0)
+    urwid.connect_signal(wdog, RPC_STATUS_CHANGED, lambda _w, status, _l: history.append(status))
+    stall(transport)
+    check = in_thread(wdog.check)
+    time.sleep(1)
+    assert history == [STATUS_DEGRADED]
+    assert transport.restarts == 0
+    transport.restart()  # unblock the check
+    check.result(timeout=5)
+    # the check finishes when the ping is answered, after a slow response
+    assert history == [STATUS_DEGRADED, STATUS_DEGRADED]